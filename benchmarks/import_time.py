@@ -0,0 +1,62 @@
+"""Measure how long it takes to import django-renderpdf.
+
+Each module is imported in a fresh interpreter, so that nothing is cached from
+previous runs. Run from the repository root with::
+
+    python -m benchmarks.import_time
+"""
+
+import statistics
+import subprocess
+import sys
+
+RUNS = 10
+MODULES = [
+    "django_renderpdf.helpers",
+    "django_renderpdf.views",
+    "testapp.urls",
+    "weasyprint",
+]
+
+CODE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start, "weasyprint" in sys.modules)
+"""
+
+
+def measure(module: str) -> tuple[list[float], bool]:
+    timings = []
+    loaded = False
+    for _ in range(RUNS):
+        result = subprocess.run(
+            [sys.executable, "-c", CODE.format(module=module)],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+        elapsed, loaded_flag = result.stdout.split()
+        timings.append(float(elapsed))
+        loaded = loaded_flag == "True"
+    return timings, loaded
+
+
+def main() -> None:
+    print(f"{'module':<28} {'median':>10} {'min':>10}  weasyprint loaded")
+    for module in MODULES:
+        try:
+            timings, loaded = measure(module)
+        except subprocess.CalledProcessError:
+            print(f"{module:<28} {'failed to import':>21}")
+            continue
+        print(
+            f"{module:<28} "
+            f"{statistics.median(timings) * 1000:>8.1f}ms "
+            f"{min(timings) * 1000:>8.1f}ms  "
+            f"{loaded}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Compare render time and output size for each render profile.
+
+Each of the test templates is rendered with each profile. Run from the repository
+root with::
+
+    python -m benchmarks.profiles
+"""
+
+import io
+import os
+import statistics
+import time
+
+import django
+
+RUNS = 10
+TEMPLATES = [
+    "test_template.html",
+    "test_template_with_staticfile.html",
+]
+
+
+def main() -> None:
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "testapp.settings")
+    django.setup()
+
+    from django_renderpdf import helpers
+
+    helpers.warm_up()
+    profiles = [None, *helpers.RENDER_PROFILES]
+
+    print(f"{'template':<36} {'profile':<10} {'median':>10} {'min':>10} {'bytes':>10}")
+    for template in TEMPLATES:
+        # Render HTML only once, so that only the PDF conversion is measured.
+        html = helpers.render_html(template)
+        for profile in profiles:
+            timings = []
+            for _ in range(RUNS):
+                file_ = io.BytesIO()
+                start = time.perf_counter()
+                helpers.html_to_pdf(html, file_, profile=profile)
+                timings.append(time.perf_counter() - start)
+            print(
+                f"{template:<36} {profile or '(none)':<10} "
+                f"{statistics.median(timings) * 1000:>8.1f}ms "
+                f"{min(timings) * 1000:>8.1f}ms "
+                f"{len(file_.getvalue()):>10}"
+            )
+
+
+if __name__ == "__main__":
+    main()
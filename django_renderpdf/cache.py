@@ -0,0 +1,307 @@
+"""An on-disk cache for resources fetched while rendering PDFs.
+
+The cache lives in a local directory, so that all worker processes on the same host
+share it. It has two kinds of files:
+
+- ``objects/`` contains the data of each resource, named after its SHA-256 digest.
+  Identical resources fetched from different URLs are stored only once.
+- ``index/`` contains one small JSON file per URL (plus validators), which refers to
+  the object with its data and holds its metadata (e.g.: the mime type).
+
+All writes are atomic, so readers never see partially written files. Objects are
+memory-mapped when read, so that workers share the operating system's page cache
+rather than each holding a copy.
+
+The approximate size of the cache is tracked in a ``usage`` file, so that the
+whole cache only needs to be scanned when it exceeds its maximum size.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import time
+from collections.abc import Callable
+from collections.abc import Iterator
+from collections.abc import Sequence
+from contextlib import contextmanager
+from contextlib import suppress
+from typing import IO
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows.
+    fcntl = None  # type: ignore[assignment]
+
+# Metadata returned by url fetchers which is kept along with the data.
+_METADATA_KEYS = ("mime_type", "encoding", "redirected_url", "filename")
+
+# Size of the chunks in which file objects returned by url fetchers are read.
+_CHUNK_SIZE = 64 * 1024
+
+
+class _PrefixedFile:
+    """A file object which reads ``prefix`` before the rest of ``file_obj``."""
+
+    def __init__(self, prefix: bytes, file_obj: IO[bytes]) -> None:
+        self._prefix = prefix
+        self._file_obj = file_obj
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0:
+            data = self._prefix + self._file_obj.read()
+            self._prefix = b""
+            return data
+        data = self._prefix[:size]
+        self._prefix = self._prefix[size:]
+        if len(data) < size:
+            data += self._file_obj.read(size - len(data))
+        return data
+
+    def close(self) -> None:
+        self._file_obj.close()
+
+
+def _read_at_most(file_obj: IO[bytes], size: int) -> bytes:
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = file_obj.read(min(remaining, _CHUNK_SIZE))
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+class FetchCache:
+    """A content-addressed on-disk cache for fetched resources.
+
+    :param directory: Directory where cached files are stored. It is created if it
+        does not exist.
+    :param max_size: Approximate maximum size of the cache, in bytes. When exceeded,
+        the least recently used entries are evicted.
+    :param max_age: Seconds for which resources without validators are considered
+        fresh. If ``0``, such resources are not cached at all.
+    :param max_object_size: Maximum size of a single resource, in bytes. Larger
+        resources are not cached. Defaults to half of ``max_size``, so that storing
+        a single resource never evicts the whole cache.
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike,
+        max_size: int = 256 * 1024 * 1024,
+        max_age: float = 0,
+        max_object_size: int | None = None,
+    ) -> None:
+        self.directory = os.fspath(directory)
+        self.max_size = max_size
+        self.max_age = max_age
+        if max_object_size is None:
+            max_object_size = max_size // 2
+        self.max_object_size = min(max_object_size, max_size)
+
+    def _key(self, url: str, validators: Sequence[str] | None) -> str:
+        key = json.dumps([url, validators])
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def _path(self, kind: str, digest: str) -> str:
+        return os.path.join(self.directory, kind, digest[:2], digest)
+
+    def _write(self, path: str, data: bytes) -> None:
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            with suppress(FileNotFoundError):
+                os.remove(tmp_path)
+            raise
+
+    def get(self, url: str, validators: Sequence[str] | None = None) -> dict | None:
+        """Return a cached resource in the same format as a url fetcher.
+
+        Returns ``None`` if the resource is not cached or is no longer fresh.
+        """
+        index_path = self._path("index", self._key(url, validators))
+        try:
+            with open(index_path) as index_file:
+                entry = json.load(index_file)
+        except (OSError, ValueError):
+            return None
+        if entry["expires"] is not None and entry["expires"] < time.time():
+            return None
+
+        object_path = self._path("objects", entry["object"])
+        try:
+            f = open(object_path, "rb")  # noqa: SIM115
+        except FileNotFoundError:
+            return None  # Evicted by another process.
+
+        with f:
+            # Mark both files as recently used.
+            with suppress(OSError):
+                os.utime(index_path)
+                os.utime(object_path)
+
+            result = {key: entry[key] for key in _METADATA_KEYS if key in entry}
+            if os.fstat(f.fileno()).st_size == 0:
+                # Empty files cannot be memory-mapped.
+                result["string"] = b""
+            else:
+                result["file_obj"] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return result
+
+    def set(
+        self,
+        url: str,
+        result: dict,
+        validators: Sequence[str] | None = None,
+    ) -> None:
+        """Store a resource returned by a url fetcher.
+
+        If ``result`` contains a ``file_obj``, it is read and replaced by ``string``,
+        so that the caller may still use ``result`` afterwards.
+
+        Resources larger than ``max_object_size`` are not stored. In that case, at
+        most ``max_object_size`` bytes of a ``file_obj`` are read, and it's replaced
+        by one which returns the whole resource, so that the caller may still read
+        it in bounded chunks.
+        """
+        if "file_obj" in result:
+            file_obj = result.pop("file_obj")
+            prefix = _read_at_most(file_obj, self.max_object_size + 1)
+            if len(prefix) > self.max_object_size:
+                result["file_obj"] = _PrefixedFile(prefix, file_obj)
+                return
+            result["string"] = prefix
+            file_obj.close()
+
+        entry = {key: result[key] for key in _METADATA_KEYS if key in result}
+        data = result["string"]
+        if isinstance(data, str):
+            entry["encoding"] = result.get("encoding") or "utf-8"
+            data = data.encode(entry["encoding"])
+        if len(data) > self.max_object_size:
+            return
+        digest = hashlib.sha256(data).hexdigest()
+        entry["object"] = digest
+        entry["expires"] = (
+            None if validators is not None else time.time() + self.max_age
+        )
+
+        # Failing to cache a resource must never break rendering.
+        with suppress(OSError):
+            written = 0
+            object_path = self._path("objects", digest)
+            if os.path.exists(object_path):
+                # Shared with other URLs; make sure it's not evicted as unused.
+                os.utime(object_path)
+            else:
+                self._write(object_path, data)
+                written += len(data)
+            index_data = json.dumps(entry).encode()
+            self._write(self._path("index", self._key(url, validators)), index_data)
+            written += len(index_data)
+            self._add_usage(written)
+
+    def fetch(
+        self,
+        url: str,
+        fetcher: Callable[[], dict],
+        validators: Sequence[str] | None = None,
+    ) -> dict:
+        """Return a resource from the cache, or fetch and cache it.
+
+        :param fetcher: Called to fetch the resource if it's not cached.
+        :param validators: Values that change whenever the resource changes (e.g.:
+            its modification time). Resources with validators never expire; those
+            without them are fresh for ``max_age`` seconds.
+        """
+        if validators is None and not self.max_age:
+            return fetcher()
+
+        result = self.get(url, validators)
+        if result is None:
+            result = fetcher()
+            self.set(url, result, validators)
+        return result
+
+    @contextmanager
+    def _lock(self) -> Iterator[None]:
+        """Hold an exclusive lock on the cache's usage across all processes."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "lock"), "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield  # The lock is released when the file is closed.
+
+    def _add_usage(self, size: int) -> None:
+        """Account for ``size`` new bytes, and evict entries if the cache is full."""
+        usage_path = os.path.join(self.directory, "usage")
+        with self._lock():
+            try:
+                with open(usage_path) as f:
+                    usage: int | None = int(f.read()) + size
+            except (OSError, ValueError):
+                usage = None  # Unknown; scan the cache to find out.
+            if usage is None or usage > self.max_size:
+                usage = self.evict()
+            self._write(usage_path, str(usage).encode())
+
+    def evict(self) -> int:
+        """Remove least recently used files until the cache fits ``max_size``.
+
+        This scans the whole cache, and returns its size after evicting entries.
+        """
+        files = []
+        total = 0
+        for kind in ("objects", "index"):
+            for dirpath, _dirnames, filenames in os.walk(
+                os.path.join(self.directory, kind)
+            ):
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    with suppress(FileNotFoundError):
+                        stat = os.stat(path)
+                        files.append((stat.st_mtime, stat.st_size, path))
+                        total += stat.st_size
+        if total <= self.max_size:
+            return total
+
+        # Evict a bit more than needed, so that this doesn't happen on every write.
+        target = self.max_size * 0.9
+        for _mtime, size, path in sorted(files):
+            with suppress(FileNotFoundError):
+                os.remove(path)
+            total -= size
+            if total <= target:
+                break
+        return total
+
+
+def get_fetch_cache() -> FetchCache | None:
+    """Return the cache configured via ``RENDERPDF_FETCH_CACHE``, if any."""
+    config = getattr(settings, "RENDERPDF_FETCH_CACHE", None)
+    if not config:
+        return None
+    return FetchCache(**config)
+
+
+def cached_fetch(
+    url: str,
+    fetcher: Callable[[], dict],
+    validators: Sequence[str] | None = None,
+) -> dict:
+    """Like :meth:`FetchCache.fetch`, but only caches if a cache is configured."""
+    cache = get_fetch_cache()
+    if cache is None:
+        return fetcher()
+    return cache.fetch(url, fetcher, validators)
@@ -1,19 +1,41 @@
+import io
 import mimetypes
+import multiprocessing
+import threading
+import time
+from collections import deque
 from collections.abc import Callable
+from collections.abc import Iterator
 from collections.abc import Sequence
+from contextlib import AbstractContextManager
+from contextlib import contextmanager
+from contextlib import nullcontext
 from contextlib import suppress
+from contextvars import ContextVar
 from typing import IO
+from typing import TYPE_CHECKING
 
 from django.conf import settings
 from django.contrib.staticfiles import finders
 from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.db import connections
+from django.dispatch import receiver
 from django.http import HttpResponse
 from django.http.request import HttpRequest
 from django.template.loader import select_template
 from django.urls import resolve
 from django.urls.exceptions import Resolver404
-from weasyprint import HTML
-from weasyprint import default_url_fetcher
+
+from django_renderpdf.cache import cached_fetch
+from django_renderpdf.cache import get_fetch_cache
+from django_renderpdf.images import RASTER_MIME_TYPES
+from django_renderpdf.images import get_image_processing
+from django_renderpdf.images import process_image
+
+if TYPE_CHECKING:
+    from multiprocessing.connection import Connection
 
 
 # Renaming this would required chaning public API and a major release:
@@ -21,9 +43,45 @@ class InvalidRelativeUrl(ValueError):  # noqa: N818
     """Raised when a relative URL cannot be handled by Django."""
 
 
+class RenderLimitError(Exception):
+    """Raised when rendering a PDF exceeds one of the configured limits.
+
+    See :ref:`render-limits` for details. Subclasses indicate which limit was
+    exceeded.
+    """
+
+
+class RenderTimeoutError(RenderLimitError):
+    """Raised when rendering a PDF takes longer than ``timeout``."""
+
+
+class PageLimitError(RenderLimitError):
+    """Raised when a rendered document has more than ``max_pages`` pages."""
+
+
+class FetchLimitError(RenderLimitError):
+    """Raised when fetched resources exceed ``max_fetched_bytes`` in total."""
+
+
+class MemoryLimitError(RenderLimitError):
+    """Raised when a rendering subprocess exceeds ``max_memory``."""
+
+
+class RenderThrottledError(RenderLimitError):
+    """Raised when too many PDFs are already being rendered by this process.
+
+    ``retry_after`` indicates how many seconds clients should wait before
+    retrying.
+    """
+
+    def __init__(self, message: str, retry_after: int) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
 def _read_staticfile(url: str, base_url: str) -> dict:
     filename = url.replace(base_url, "", 1)
-    data = None
+    mime_type = mimetypes.guess_type(url)[0]
 
     path = finders.find(filename)
     if path:
@@ -31,21 +89,46 @@ def _read_staticfile(url: str, base_url: str) -> dict:
         # app that provides it. This also picks up uncollected staticfiles which is
         # useful when developing / in DEBUG mode.
         with open(path, "rb") as f:
-            data = f.read()
-    else:
-        # File was not found by a finder. This commonly happens when running in
-        # DEBUG=True with a storage that uses Manifests or alike, since the filename
-        # won't match with the source file. In these cases, use the _storage_ to find
-        # the file instead:
+            return {"mime_type": mime_type, "string": f.read()}
+
+    # File was not found by a finder. This commonly happens when running in
+    # DEBUG=True with a storage that uses Manifests or alike, since the filename
+    # won't match with the source file. In these cases, use the _storage_ to find
+    # the file instead:
+    def read_from_storage() -> dict:
         with staticfiles_storage.open(filename) as f:
-            data = f.read()
+            return {"mime_type": mime_type, "string": f.read()}
+
+    fetch_cache = get_fetch_cache()
+    if fetch_cache is None:
+        return read_from_storage()
+
+    # Storages may be remote, so cache their files, using the modification time to
+    # detect changes. Files found by finders above are already on local disk.
+    try:
+        validators = [staticfiles_storage.get_modified_time(filename).isoformat()]
+    except NotImplementedError:
+        validators = None
+    return fetch_cache.fetch(url, read_from_storage, validators)
+
+
+def _read_view(url: str) -> dict:
+    view, args, kwargs = resolve(url)
+    kwargs["request"] = HttpRequest
+    kwargs["request"].method = "GET"
+    response = view(*args, **kwargs)
 
     return {
         "mime_type": mimetypes.guess_type(url)[0],
-        "string": data,
+        "string": response.content,
     }
 
 
+# Options of the PDF currently being rendered which override WEASYPRINT_OPTIONS
+# (e.g.: those of its profile). Set by start_render.
+_render_options: ContextVar[dict | None] = ContextVar("render_options", default=None)
+
+
 def django_url_fetcher(url: str) -> dict:
     # TODO: define a TypedDict with the return type and upstream it.
     """Returns the file for a given URL.
@@ -63,7 +146,20 @@ def django_url_fetcher(url: str) -> dict:
     Returns a dictionary with two entries: ``string``, which is the
     resources data as a string and ``mime_type``, which is the identified
     mime type for the resource.
+
+    If ``RENDERPDF_FETCH_CACHE`` is configured, resources may be returned from
+    the cache instead; see :ref:`fetch-cache`. If ``RENDERPDF_IMAGE_PROCESSING``
+    is configured, raster images are downscaled; see :ref:`image-processing`.
     """
+    result = _fetch(url)
+
+    image_processing = get_image_processing(_render_options.get())
+    if image_processing and result.get("mime_type") in RASTER_MIME_TYPES:
+        return process_image(result, **image_processing)
+    return result
+
+
+def _fetch(url: str) -> dict:
 
     # If the URL looks like a staticfile, try to load it as such.
     # Reading it from the storage avoids the HTTP round-trip in many cases.
@@ -84,27 +180,391 @@ def django_url_fetcher(url: str) -> dict:
         # - Custom views that serve dynamically generated files.
         # - Media files (if serving them via Django, which is not recommended).
         if url.startswith("/"):
-            view, args, kwargs = resolve(url)
-            kwargs["request"] = HttpRequest
-            kwargs["request"].method = "GET"
-            response = view(*args, **kwargs)
-
-            return {
-                "mime_type": mimetypes.guess_type(url)[0],
-                "string": response.content,
-            }
+            return cached_fetch(url, lambda: _read_view(url))
     except Resolver404 as e:
         raise InvalidRelativeUrl(f"No view matched `{url}`.") from e
 
+    from weasyprint import default_url_fetcher
+
+    if url.startswith(("http://", "https://")):
+        return cached_fetch(url, lambda: default_url_fetcher(url))
     return default_url_fetcher(url)
 
 
+def warm_up() -> None:
+    """Import WeasyPrint and its native dependencies eagerly.
+
+    WeasyPrint is only imported when the first PDF is rendered, so that processes
+    which never render PDFs (e.g.: most management commands) don't pay for loading
+    it. Long-running processes may call this function during start-up (e.g.: from
+    an ``AppConfig.ready()`` or a gunicorn ``post_fork`` hook) so that the first
+    request doesn't pay for it either.
+
+    .. versionadded:: 6.0
+    """
+    import weasyprint  # noqa: F401
+
+
+# Built-in render profiles. More may be defined via the RENDERPDF_PROFILES setting.
+RENDER_PROFILES: dict[str, dict] = {
+    # Render as quickly as possible. Skips compression and font subsetting, which
+    # results in much larger files.
+    "fast": {
+        "uncompressed_pdf": True,
+        "optimize_images": False,
+        "full_fonts": True,
+        "hinting": False,
+    },
+    # Produce small files, at the cost of render time and image quality.
+    "small": {
+        "uncompressed_pdf": False,
+        "optimize_images": True,
+        "jpeg_quality": 75,
+        "dpi": 150,
+        "full_fonts": False,
+        "hinting": False,
+    },
+    # Long-term archival as PDF/A-3b, without any lossy image recompression.
+    "archival": {
+        "pdf_variant": "pdf/a-3b",
+        "uncompressed_pdf": False,
+        "optimize_images": False,
+        "jpeg_quality": None,
+        "dpi": None,
+        "full_fonts": False,
+    },
+}
+
+
+# Options that only apply to laying out or to writing a document respectively. These
+# mirror how ``HTML.write_pdf`` splits its arguments between both steps.
+_WRITE_OPTIONS = ("zoom", "finisher")
+_RENDER_OPTIONS = ("font_config", "counter_style", "color_profiles")
+
+
+class _RenderLimits:
+    """Enforces limits for a single render.
+
+    WeasyPrint logs and ignores any exceptions raised by url fetchers, so errors are
+    recorded when fetching and raised again by :meth:`check`.
+    """
+
+    def __init__(self, url_fetcher: Callable[[str], dict], limits: dict) -> None:
+        self.url_fetcher = url_fetcher
+        self.timeout = limits.get("timeout")
+        self.max_pages = limits.get("max_pages")
+        self.max_fetched_bytes = limits.get("max_fetched_bytes")
+        self.max_memory = limits.get("max_memory")
+        self.subprocess = limits.get("subprocess", False)
+
+        # Only a subprocess can be interrupted (or constrained) while rendering.
+        for name in ("timeout", "max_memory"):
+            if limits.get(name) is not None and not self.subprocess:
+                raise ImproperlyConfigured(
+                    f"The '{name}' render limit requires 'subprocess' to be enabled."
+                )
+
+        self.deadline = None
+        if self.timeout is not None:
+            self.deadline = time.monotonic() + self.timeout
+        self.fetched_bytes = 0
+        self.error: RenderLimitError | None = None
+
+    def remaining_time(self) -> float | None:
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0)
+
+    def check(self) -> None:
+        """Raise an error if any limit has been exceeded so far."""
+        if self.error is not None:
+            raise self.error
+        if self.remaining_time() == 0:
+            self.error = RenderTimeoutError(
+                f"Rendering took longer than {self.timeout} seconds."
+            )
+            raise self.error
+
+    def check_pages(self, pages: int) -> None:
+        if self.max_pages is not None and pages > self.max_pages:
+            raise PageLimitError(
+                f"Document has {pages} pages, the limit is {self.max_pages}."
+            )
+
+    def fetch(self, url: str) -> dict:
+        self.check()
+        result = self.url_fetcher(url)
+        if self.max_fetched_bytes is None:
+            return result
+
+        if "file_obj" in result:
+            # Don't read more than needed to know that the limit was exceeded.
+            file_obj = result.pop("file_obj")
+            remaining = self.max_fetched_bytes - self.fetched_bytes
+            result["string"] = file_obj.read(remaining + 1)
+            file_obj.close()
+
+        data = result["string"]
+        self.fetched_bytes += len(data.encode() if isinstance(data, str) else data)
+        if self.fetched_bytes > self.max_fetched_bytes:
+            self.error = FetchLimitError(
+                f"Fetched resources exceed {self.max_fetched_bytes} bytes."
+            )
+            raise self.error
+        return result
+
+
+def _write_pdf(
+    html: str,
+    file_: IO[bytes] | HttpResponse,
+    limits: _RenderLimits,
+    options: dict,
+) -> None:
+    from weasyprint import HTML
+
+    # Lay out the document first, so that limits are checked before drawing it.
+    document = HTML(
+        string=html,
+        base_url="not-used://",
+        url_fetcher=limits.fetch,
+    ).render(**{k: v for k, v in options.items() if k not in _WRITE_OPTIONS})
+    limits.check()
+    limits.check_pages(len(document.pages))
+    document.write_pdf(
+        target=file_,
+        **{k: v for k, v in options.items() if k not in _RENDER_OPTIONS},
+    )
+    limits.check()
+
+
+def _subprocess_main(
+    connection: "Connection",
+    html: str,
+    limits: _RenderLimits,
+    options: dict,
+) -> None:
+    # Database connections inherited from the parent share its sockets, so using
+    # them here (e.g.: from views fetched by django_url_fetcher) would corrupt the
+    # parent's sessions. Drop them without closing them, so that new ones are
+    # opened if needed.
+    for conn in connections.all(initialized_only=True):
+        conn.connection = None
+
+    if limits.max_memory is not None:
+        import resource
+
+        resource.setrlimit(resource.RLIMIT_AS, (limits.max_memory, limits.max_memory))
+
+    buffer = io.BytesIO()
+    try:
+        _write_pdf(html, buffer, limits, options)
+    except MemoryError:
+        error: Exception = MemoryLimitError(
+            f"Rendering used more than {limits.max_memory} bytes of memory."
+        )
+    except Exception as e:  # noqa: BLE001
+        error = e
+    else:
+        connection.send((None, buffer.getvalue()))
+        return
+
+    try:
+        connection.send((error, None))
+    except Exception:  # noqa: BLE001
+        # The exception itself may not be picklable.
+        connection.send((RuntimeError(repr(error)), None))
+
+
+def _write_pdf_in_subprocess(
+    html: str,
+    file_: IO[bytes] | HttpResponse,
+    limits: _RenderLimits,
+    options: dict,
+) -> None:
+    try:
+        mp_context = multiprocessing.get_context("fork")
+    except ValueError as e:
+        raise ImproperlyConfigured(
+            "Rendering in a subprocess requires a platform that supports fork()."
+        ) from e
+
+    # Import weasyprint here, so that it is inherited rather than imported each time.
+    warm_up()
+
+    receiver, sender = mp_context.Pipe(duplex=False)
+    process = mp_context.Process(
+        target=_subprocess_main,
+        args=(sender, html, limits, options),
+        daemon=True,
+    )
+    process.start()
+    sender.close()
+    try:
+        if not receiver.poll(limits.remaining_time()):
+            raise RenderTimeoutError(
+                f"Rendering took longer than {limits.timeout} seconds."
+            )
+        try:
+            error, data = receiver.recv()
+        except EOFError:
+            # The child died without reporting back. Native code may abort rather
+            # than raise MemoryError when allocations fail.
+            process.join()
+            if limits.max_memory is not None:
+                raise MemoryLimitError(
+                    f"Rendering subprocess died with exit code {process.exitcode}; "
+                    f"it most likely exceeded {limits.max_memory} bytes of memory."
+                ) from None
+            raise RuntimeError(
+                f"Rendering subprocess died with exit code {process.exitcode}."
+            ) from None
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join()
+        receiver.close()
+
+    if error is not None:
+        raise error
+    file_.write(data)
+
+
+class RenderThrottle:
+    """Limits how many PDFs are rendered concurrently by this process.
+
+    Renders beyond ``max_concurrent`` wait in a first-in, first-out queue of up to
+    ``max_queued`` renders, for at most ``timeout`` seconds. Renders that don't fit
+    in the queue or time out raise :class:`RenderThrottledError`.
+
+    See :ref:`throttling`.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_queued: int = 10,
+        timeout: float = 10,
+        retry_after: int = 5,
+    ) -> None:
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.retry_after = retry_after
+
+        self._condition = threading.Condition()
+        # Renders waiting for a slot, in order of arrival.
+        self._waiters: deque[object] = deque()
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def _reject(self, message: str) -> RenderThrottledError:
+        self.rejected += 1
+        return RenderThrottledError(message, self.retry_after)
+
+    @contextmanager
+    def acquire(self) -> Iterator[None]:
+        """Wait for a rendering slot, and hold it for the duration of the block."""
+        start = time.monotonic()
+        with self._condition:
+            # Queue behind any waiting renders, even if a slot is free; it was freed
+            # for the first of them.
+            if self.active >= self.max_concurrent or self._waiters:
+                if len(self._waiters) >= self.max_queued:
+                    raise self._reject("Too many PDFs are being rendered.")
+                waiter = object()
+                self._waiters.append(waiter)
+                try:
+                    admitted = self._condition.wait_for(
+                        lambda: (
+                            self._waiters[0] is waiter
+                            and self.active < self.max_concurrent
+                        ),
+                        self.timeout,
+                    )
+                finally:
+                    self._waiters.remove(waiter)
+                    # Another render may now be first in line.
+                    self._condition.notify_all()
+                if not admitted:
+                    raise self._reject("Timed out waiting to render PDF.")
+
+            wait_time = time.monotonic() - start
+            self.active += 1
+            self.admitted += 1
+            self.total_wait_time += wait_time
+            self.max_wait_time = max(self.max_wait_time, wait_time)
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.active -= 1
+                # Wake all waiters, since only the first in line may take the slot.
+                self._condition.notify_all()
+
+    @property
+    def queued(self) -> int:
+        """The amount of renders waiting for a slot."""
+        return len(self._waiters)
+
+    def stats(self) -> dict:
+        """Return a snapshot of this throttle's metrics.
+
+        ``active`` and ``queued`` are the amount of renders in progress and waiting
+        right now. ``admitted`` and ``rejected`` count renders since the process
+        started, and ``total_wait_time`` and ``max_wait_time`` are the time spent by
+        admitted renders in the queue, in seconds.
+        """
+        with self._condition:
+            return {
+                "active": self.active,
+                "queued": self.queued,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "total_wait_time": self.total_wait_time,
+                "max_wait_time": self.max_wait_time,
+            }
+
+
+_render_throttle: RenderThrottle | None = None
+_render_throttle_lock = threading.Lock()
+
+
+def get_render_throttle() -> RenderThrottle | None:
+    """Return the throttle configured via ``RENDERPDF_THROTTLE``, if any.
+
+    The same instance is shared by all threads of this process.
+    """
+    global _render_throttle
+
+    config = getattr(settings, "RENDERPDF_THROTTLE", None)
+    if not config:
+        return None
+    with _render_throttle_lock:
+        if _render_throttle is None:
+            _render_throttle = RenderThrottle(**config)
+        return _render_throttle
+
+
+@receiver(setting_changed)
+def _reset_render_throttle(setting: str, **kwargs) -> None:
+    global _render_throttle
+
+    if setting == "RENDERPDF_THROTTLE":
+        _render_throttle = None
+
+
 def render_pdf(
     template: Sequence[str] | str,
     file_: IO[bytes] | HttpResponse,
     url_fetcher: Callable[[str], dict] = django_url_fetcher,
     context: dict | None = None,
     options: dict | None = None,
+    limits: dict | None = None,
+    profile: str | None = None,
 ) -> None:
     """
     Writes the PDF data into ``file_``. Note that ``file_`` can actually be a
@@ -120,24 +580,141 @@ def render_pdf(
         the rendered PDF.
     :param url_fetcher: See `weasyprint's documentation on url_fetcher`_.
     :param context: Context parameters used when rendering the template.
-    :param options: Additional options to be passed to weasyprint.
+    :param options: Additional options to be passed to weasyprint. These override
+        those of the ``profile``.
+    :param limits: Limits enforced while rendering. These are merged with the
+        ``RENDERPDF_LIMITS`` setting. See :ref:`render-limits`.
+    :param profile: The name of a render profile, which is a set of options for
+        weasyprint. See :ref:`render-profiles`.
+    :raises RenderLimitError: If rendering exceeds any of the given ``limits``,
+        or if it is throttled (see :ref:`throttling`).
 
     .. _weasyprint's documentation on url_fetcher: https://weasyprint.readthedocs.io/en/stable/tutorial.html#url-fetchers
     """
-    context = context or {}
-    options = options or {}
+    with start_render(url_fetcher, options, limits, profile) as write_pdf:
+        write_pdf(render_html(template, context), file_)
+
+
+def render_html(template: Sequence[str] | str, context: dict | None = None) -> str:
+    """Renders a template into HTML, just as :func:`render_pdf` does.
+
+    Together with :func:`html_to_pdf`, this allows rendering a template only once
+    and using the resulting HTML for more than just a PDF.
+
+    :param template: A list of templates, or a single template. If a list of
+        templates is passed, these will be searched in order, and the first
+        one found will be used.
+    :param context: Context parameters used when rendering the template.
 
+    .. versionadded:: 6.0
+    """
     if isinstance(template, str):
         template = [template]
-    global_options = getattr(settings, "WEASYPRINT_OPTIONS", {})
-    options = {**global_options, **options}
     # HACK: Workaround for Python 3.10 and Python 3.11.
-    html = str.__str__(select_template(template).render(context))
-    HTML(
-        string=html,
-        base_url="not-used://",
-        url_fetcher=url_fetcher,
-    ).write_pdf(
-        target=file_,
-        **options,
-    )
+    return str.__str__(select_template(template).render(context or {}))
+
+
+def html_to_pdf(
+    html: str,
+    file_: IO[bytes] | HttpResponse,
+    url_fetcher: Callable[[str], dict] = django_url_fetcher,
+    options: dict | None = None,
+    limits: dict | None = None,
+    profile: str | None = None,
+) -> None:
+    """Writes the PDF for already rendered ``html`` into ``file_``.
+
+    This behaves like :func:`render_pdf`, but takes HTML (e.g.: as returned by
+    :func:`render_html`) rather than a template and context. Note that neither
+    throttling nor the ``timeout`` limit include the time spent rendering the HTML;
+    use :func:`start_render` for that.
+
+    .. versionadded:: 6.0
+    """
+    with start_render(url_fetcher, options, limits, profile) as write_pdf:
+        write_pdf(html, file_)
+
+
+@contextmanager
+def start_render(
+    url_fetcher: Callable[[str], dict] = django_url_fetcher,
+    options: dict | None = None,
+    limits: dict | None = None,
+    profile: str | None = None,
+) -> Iterator[Callable[[str, IO[bytes] | HttpResponse], None]]:
+    """Start rendering a PDF, and yield a function which writes it.
+
+    The rendering slot (see :ref:`throttling`) is held and the ``timeout`` limit
+    runs for the duration of the block, so that they include rendering the HTML
+    within it. The yielded function takes the ``html`` and ``file_`` arguments of
+    :func:`html_to_pdf`, and should be called once:
+
+    .. code:: python
+
+        with start_render(profile="small") as write_pdf:
+            html = render_html("invoice.html", context)
+            write_pdf(html, file_)
+
+    Parameters are the same as those of :func:`render_pdf`.
+
+    :raises RenderLimitError: If rendering is throttled when starting, or exceeds
+        any of the given ``limits`` when writing the PDF.
+
+    .. versionadded:: 6.0
+    """
+    overrides = {**_get_profile(profile), **(options or {})}
+    options = {**getattr(settings, "WEASYPRINT_OPTIONS", {}), **overrides}
+    limits = {**getattr(settings, "RENDERPDF_LIMITS", {}), **(limits or {})}
+    with _acquire_render_slot():
+        render_limits = _RenderLimits(url_fetcher, limits) if limits else None
+
+        def write_pdf(html: str, file_: IO[bytes] | HttpResponse) -> None:
+            _html_to_pdf(html, file_, url_fetcher, options, render_limits)
+
+        token = _render_options.set(overrides)
+        try:
+            yield write_pdf
+        finally:
+            _render_options.reset(token)
+
+
+def _get_profile(profile: str | None) -> dict:
+    if profile is None:
+        return {}
+    profiles = {**RENDER_PROFILES, **getattr(settings, "RENDERPDF_PROFILES", {})}
+    try:
+        return profiles[profile]
+    except KeyError:
+        raise ImproperlyConfigured(f"Unknown render profile '{profile}'.") from None
+
+
+def _acquire_render_slot() -> AbstractContextManager:
+    throttle = get_render_throttle()
+    return throttle.acquire() if throttle is not None else nullcontext()
+
+
+def _html_to_pdf(
+    html: str,
+    file_: IO[bytes] | HttpResponse,
+    url_fetcher: Callable[[str], dict],
+    options: dict,
+    render_limits: _RenderLimits | None,
+) -> None:
+    if render_limits is None:
+        from weasyprint import HTML
+
+        HTML(
+            string=html,
+            base_url="not-used://",
+            url_fetcher=url_fetcher,
+        ).write_pdf(
+            target=file_,
+            **options,
+        )
+        return
+
+    render_limits.check()
+    if render_limits.subprocess:
+        _write_pdf_in_subprocess(html, file_, render_limits, options)
+    else:
+        _write_pdf(html, file_, render_limits, options)
@@ -0,0 +1,173 @@
+"""Downscaling and recompression of raster images fetched while rendering PDFs."""
+
+import hashlib
+import io
+import json
+
+from django.conf import settings
+
+from django_renderpdf.cache import cached_fetch
+
+# Images in these formats are processed. Anything else (e.g.: SVGs, animated GIFs)
+# is returned as-is.
+RASTER_MIME_TYPES = ("image/jpeg", "image/png", "image/webp")
+
+# An A4 page, in CSS pixels.
+DEFAULT_MAX_WIDTH = 794
+DEFAULT_MAX_HEIGHT = 1123
+
+
+def get_image_processing(options: dict | None = None) -> dict | None:
+    """Return image processing parameters, or ``None`` if it is disabled.
+
+    Parameters come from ``RENDERPDF_IMAGE_PROCESSING``, with ``dpi`` and
+    ``jpeg_quality`` defaulting to those in ``WEASYPRINT_OPTIONS``.
+
+    ``options`` are WeasyPrint options which override ``WEASYPRINT_OPTIONS`` for the
+    current render (e.g.: those of its profile). Their ``dpi`` and ``jpeg_quality``
+    take precedence over ``RENDERPDF_IMAGE_PROCESSING``. If either is ``None``,
+    images are not downscaled or JPEG images are not re-encoded, respectively.
+
+    WeasyPrint re-encodes every JPEG image itself if its ``jpeg_quality`` or
+    ``optimize_images`` options are set. In that case, JPEG images which are not
+    downscaled are not recompressed, so that they're not encoded twice.
+    """
+    config = getattr(settings, "RENDERPDF_IMAGE_PROCESSING", None)
+    if not config:
+        return None
+
+    global_options = getattr(settings, "WEASYPRINT_OPTIONS", {})
+    options = options or {}
+    if "dpi" in options:
+        dpi = options["dpi"]
+    else:
+        dpi = config.get("dpi") or global_options.get("dpi") or 300
+    if "jpeg_quality" in options:
+        jpeg_quality = options["jpeg_quality"]
+    else:
+        jpeg_quality = (
+            config.get("jpeg_quality") or global_options.get("jpeg_quality") or 85
+        )
+    weasyprint_options = {**global_options, **options}
+    recompress = not (
+        weasyprint_options.get("optimize_images")
+        or weasyprint_options.get("jpeg_quality") is not None
+    )
+    if dpi is None and (jpeg_quality is None or not recompress):
+        return None  # There's nothing left to do.
+
+    if dpi is None:
+        max_width = max_height = None
+    else:
+        # Maximum sizes are in CSS pixels, which are 1/96th of an inch.
+        max_width = round(config.get("max_width", DEFAULT_MAX_WIDTH) * dpi / 96)
+        max_height = round(config.get("max_height", DEFAULT_MAX_HEIGHT) * dpi / 96)
+    return {
+        "max_width": max_width,
+        "max_height": max_height,
+        "jpeg_quality": jpeg_quality,
+        "recompress": recompress,
+    }
+
+
+def _resize(
+    data: bytes,
+    max_width: int | None,
+    max_height: int | None,
+    jpeg_quality: int | None,
+    *,
+    recompress: bool,
+) -> dict:
+    from PIL import Image
+    from PIL import ImageOps
+
+    output = io.BytesIO()
+    try:
+        with Image.open(io.BytesIO(data)) as original:
+            is_jpeg = original.format == "JPEG"
+            if is_jpeg and jpeg_quality is None:
+                # Any re-encoding would be lossy.
+                return {"string": data}
+            width, height = original.size
+            if max_width is not None and max_height is not None:
+                # Let the JPEG decoder skip detail which would be discarded anyway.
+                # The size is square, since the image may be rotated below.
+                size = max(max_width, max_height)
+                original.draft(original.mode, (size, size))
+            # Orientation is lost when re-encoding, so apply it to the pixels instead.
+            image = ImageOps.exif_transpose(original)
+            icc_profile = original.info.get("icc_profile")
+            if max_width is not None and max_height is not None:
+                image.thumbnail((max_width, max_height))
+            # Compare areas, since the image may have been rotated.
+            downscaled = image.width * image.height < width * height
+
+            if not downscaled and not (is_jpeg and recompress):
+                # Re-encoding to a different format would only change the size of
+                # the file, not that of the image which WeasyPrint decodes.
+                return {"string": data}
+
+            if is_jpeg:
+                image.save(
+                    output,
+                    format="JPEG",
+                    quality=jpeg_quality,
+                    optimize=True,
+                    icc_profile=icc_profile,
+                )
+                mime_type = "image/jpeg"
+            else:
+                image.save(output, "PNG", optimize=True, icc_profile=icc_profile)
+                mime_type = "image/png"
+    except (OSError, ValueError, SyntaxError, Image.DecompressionBombError):
+        # Leave broken or unsupported images for WeasyPrint to deal with.
+        return {"string": data}
+
+    processed = output.getvalue()
+    if not downscaled and len(processed) >= len(data):
+        # Recompressing did not help; keep the original.
+        return {"string": data}
+    return {"string": processed, "mime_type": mime_type}
+
+
+def process_image(
+    result: dict,
+    max_width: int | None,
+    max_height: int | None,
+    jpeg_quality: int | None,
+    *,
+    recompress: bool = True,
+) -> dict:
+    """Downscale and recompress an image returned by a url fetcher.
+
+    Images larger than ``max_width`` x ``max_height`` pixels are downscaled. JPEG
+    images are re-encoded with ``jpeg_quality`` and other formats as PNG. JPEG
+    images which are not downscaled are only recompressed if ``recompress`` is
+    ``True``, and only replaced if that makes them smaller.
+
+    If the maximum size is ``None``, images are not downscaled. If ``jpeg_quality``
+    is ``None``, JPEG images are left untouched.
+
+    Note that the whole image is read before the ``max_fetched_bytes`` render
+    limit counts it, and that the limit counts the processed image.
+
+    Processed images are cached by the digest of the original and the parameters
+    when ``RENDERPDF_FETCH_CACHE`` is configured.
+    """
+    if "file_obj" in result:
+        file_obj = result.pop("file_obj")
+        result["string"] = file_obj.read()
+        file_obj.close()
+
+    data = result["string"]
+    digest = hashlib.sha256(data).hexdigest()
+    params = json.dumps([max_width, max_height, jpeg_quality, recompress])
+    processed = cached_fetch(
+        f"renderpdf-image:{digest}",
+        lambda: _resize(
+            data, max_width, max_height, jpeg_quality, recompress=recompress
+        ),
+        validators=[params],
+    )
+    del result["string"]
+    return {**result, **processed}
@@ -1,10 +1,11 @@
+from collections.abc import Callable
 from collections.abc import Sequence
 from typing import Any
 
 from django.core.exceptions import ImproperlyConfigured
 from django.http import HttpRequest
 from django.http import HttpResponse
-from django.template.loader import select_template
+from django.http.response import HttpResponseBase
 from django.views.generic import View
 from django.views.generic.base import ContextMixin
 
@@ -60,18 +61,37 @@ class PDFView(View, ContextMixin):
 
         This attribute has no effect if ``prompt_download = False``.
 
+    .. autoattribute:: profile
+
+        The name of the render profile used for this view, which determines
+        options such as compression and image optimisation. See
+        :ref:`render-profiles`.
+
+    .. autoattribute:: limits
+
+        Limits enforced when rendering this view, merged with the
+        ``RENDERPDF_LIMITS`` setting. See :ref:`render-limits`.
+
+        If a limit is exceeded, the response is generated by
+        :func:`~render_limit_exceeded`.
+
     The following methods may also be overridden to further customise subclasses:
 
     .. automethod:: url_fetcher
     .. automethod:: get_template_names
     .. automethod:: get_download_name
     .. automethod:: get_template_name
+    .. automethod:: render_limit_exceeded
+    .. automethod:: get_html_response
+    .. automethod:: get_pdf_response
     """
 
     template_name: str | None = None
     allow_force_html: bool = True
     prompt_download: bool = False
     download_name: str | None = None
+    profile: str | None = None
+    limits: dict | None = None
 
     def url_fetcher(self, url: str) -> dict:
         """Returns the file matching URL.
@@ -127,35 +147,99 @@ class PDFView(View, ContextMixin):
             )
         return self.template_name
 
+    def render_limit_exceeded(self, error: helpers.RenderLimitError) -> HttpResponse:
+        """Return the response used when rendering exceeds one of the ``limits``.
+
+        By default, throttled and timed out renders return a plain-text ``503 Service
+        Unavailable`` response, since retrying later may succeed. Throttled responses
+        include a ``Retry-After`` header. Other limits (e.g.: ``max_pages``) would be
+        exceeded again on retry, so these return ``422 Unprocessable Content``.
+
+        Details of the configured limits are not included in the response.
+        """
+        if not isinstance(
+            error,
+            (helpers.RenderThrottledError, helpers.RenderTimeoutError),
+        ):
+            return HttpResponse(
+                "The document exceeds the limits for rendering PDFs.",
+                content_type="text/plain",
+                status=422,
+            )
+
+        if isinstance(error, helpers.RenderTimeoutError):
+            return HttpResponse(
+                "Rendering the PDF took too long.",
+                content_type="text/plain",
+                status=503,
+            )
+
+        response = HttpResponse(
+            "Too many PDFs are being rendered. Please try again later.",
+            content_type="text/plain",
+            status=503,
+        )
+        response["Retry-After"] = str(error.retry_after)
+        return response
+
     def render(
         self,
         request: HttpRequest,
         template: Sequence[str] | str,
         context: dict[str, Any],
-    ) -> HttpResponse:
+    ) -> HttpResponseBase:
         """Returns a response.
 
         By default, this will contain the rendered PDF, but if both ``allow_force_html``
         is ``True`` and the querystring ``html=true`` was set it will return a plain
         HTML.
+
+        The template is rendered into HTML only once, and the result is passed to
+        either :func:`~get_html_response` or :func:`~get_pdf_response`. When
+        rendering a PDF, throttling and the ``timeout`` limit include rendering the
+        template.
         """
         if self.allow_force_html and self.request.GET.get("html", False):
-            html = select_template(template).render(context)
-            return HttpResponse(html)
+            return self.get_html_response(helpers.render_html(template, context))
+
+        try:
+            with helpers.start_render(
+                url_fetcher=self.url_fetcher,
+                limits=self.limits,
+                profile=self.profile,
+            ) as write_pdf:
+                html = helpers.render_html(template, context)
+                return self.get_pdf_response(html, write_pdf)
+        except helpers.RenderLimitError as e:
+            return self.render_limit_exceeded(e)
+
+    def get_html_response(self, html: str) -> HttpResponse:
+        """Return a response with the rendered HTML.
+
+        .. versionadded:: 6.0
+        """
+        return HttpResponse(html)
+
+    def get_pdf_response(
+        self,
+        html: str,
+        write_pdf: Callable[[str, HttpResponse], None],
+    ) -> HttpResponse:
+        """Return a response with the PDF rendered from the given HTML.
+
+        ``write_pdf`` is the function yielded by :func:`~.start_render`.
+
+        .. versionadded:: 6.0
+        """
         response = HttpResponse(content_type="application/pdf")
         if self.prompt_download:
             filename = self.get_download_name()
             response["Content-Disposition"] = f'attachment; filename="{filename}"'
-        helpers.render_pdf(
-            template=template,
-            file_=response,
-            url_fetcher=self.url_fetcher,
-            context=context,
-        )
+        write_pdf(html, response)
         return response
 
     # Move all the above into BasePdfView, which can be subclassed for posting
-    def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+    def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponseBase:
         context = self.get_context_data(**kwargs)
         return self.render(
             request=request,
@@ -0,0 +1,191 @@
+import io
+import os
+from pathlib import Path
+from unittest.mock import Mock
+from unittest.mock import patch
+
+import pytest
+from django.test import override_settings
+
+from django_renderpdf import helpers
+from django_renderpdf.cache import FetchCache
+from django_renderpdf.helpers import FetchLimitError
+
+
+def test_cache_roundtrip(tmp_path: Path) -> None:
+    cache = FetchCache(tmp_path)
+    result = {"string": b"* { color: red; }", "mime_type": "text/css"}
+
+    cache.set("/style.css", result, validators=["v1"])
+    cached = cache.get("/style.css", validators=["v1"])
+
+    assert cached is not None
+    assert cached["mime_type"] == "text/css"
+    assert cached["file_obj"].read() == b"* { color: red; }"
+    assert cache.get("/style.css", validators=["v2"]) is None
+    assert cache.get("/other.css", validators=["v1"]) is None
+
+
+def test_cache_stores_text(tmp_path: Path) -> None:
+    cache = FetchCache(tmp_path)
+
+    cache.set("/style.css", {"string": "* { content: 'ñ'; }"}, validators=[])
+    cached = cache.get("/style.css", validators=[])
+
+    assert cached is not None
+    assert cached["encoding"] == "utf-8"
+    assert cached["file_obj"].read() == "* { content: 'ñ'; }".encode()
+
+
+def test_cache_is_content_addressed(tmp_path: Path) -> None:
+    cache = FetchCache(tmp_path)
+
+    cache.set("/a.css", {"string": b"same"}, validators=[])
+    cache.set("/b.css", {"string": b"same"}, validators=[])
+
+    objects = [files for _, _, files in os.walk(tmp_path / "objects") if files]
+    assert len(objects) == 1
+    assert len(objects[0]) == 1
+
+
+def test_cache_without_validators_disabled_by_default(tmp_path: Path) -> None:
+    cache = FetchCache(tmp_path)
+    fetcher = Mock(return_value={"string": b"data"})
+
+    cache.fetch("https://example.com/a.png", fetcher)
+    cache.fetch("https://example.com/a.png", fetcher)
+
+    assert fetcher.call_count == 2
+    assert not tmp_path.joinpath("index").exists()
+
+
+def test_cache_without_validators_expires(tmp_path: Path) -> None:
+    cache = FetchCache(tmp_path, max_age=60)
+    fetcher = Mock(return_value={"string": b"data"})
+
+    cache.fetch("https://example.com/a.png", fetcher)
+    cache.fetch("https://example.com/a.png", fetcher)
+    assert fetcher.call_count == 1
+
+    with patch("time.time", return_value=10**10):
+        cache.fetch("https://example.com/a.png", fetcher)
+    assert fetcher.call_count == 2
+
+
+def test_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    cache = FetchCache(tmp_path, max_size=3000)
+
+    for i in range(5):
+        cache.set(f"/{i}.bin", {"string": bytes([i]) * 1000}, validators=[])
+        # Make sure modification times are distinct.
+        for path in tmp_path.rglob("*"):
+            if path.is_file():
+                os.utime(path, (0, path.stat().st_mtime - 1))
+
+    size = sum(p.stat().st_size for p in tmp_path.rglob("*") if p.is_file())
+    assert size <= 3000
+    assert cache.get("/0.bin", validators=[]) is None
+    assert cache.get("/4.bin", validators=[]) is not None
+
+
+def test_fetcher_caches_view_urls(tmp_path: Path) -> None:
+    config = {"directory": tmp_path, "max_age": 60}
+
+    with override_settings(RENDERPDF_FETCH_CACHE=config):
+        helpers.django_url_fetcher("/view.css")
+        with patch("django_renderpdf.helpers.resolve", spec=True) as resolve:
+            fetched = helpers.django_url_fetcher("/view.css")
+
+    assert resolve.call_count == 0
+    assert fetched["mime_type"] == "text/css"
+    assert fetched["file_obj"].read() == b"* { background-color: red; }"
+
+
+def test_fetcher_caches_staticfiles_from_storage(tmp_path: Path) -> None:
+    config = {"directory": tmp_path}
+
+    with (
+        override_settings(RENDERPDF_FETCH_CACHE=config),
+        patch(
+            "django.contrib.staticfiles.finders.find",
+            return_value=None,
+            spec=True,
+        ),
+    ):
+        helpers.django_url_fetcher("/static/styles.css")
+        with patch(
+            "django.contrib.staticfiles.storage.staticfiles_storage.open",
+        ) as storage_open:
+            fetched = helpers.django_url_fetcher("/static/styles.css")
+
+    assert storage_open.call_count == 0
+    assert fetched["mime_type"] == "text/css"
+    assert fetched["file_obj"].read() == b"html { margin: 0; }\n"
+
+
+def test_cache_only_scans_when_full(tmp_path: Path) -> None:
+    cache = FetchCache(tmp_path, max_size=10_000)
+
+    with patch.object(cache, "evict", wraps=cache.evict) as evict:
+        for i in range(5):
+            cache.set(f"/{i}.bin", {"string": bytes([i]) * 100}, validators=[])
+
+    # Only the first write scans, since the cache's usage was still unknown.
+    assert evict.call_count == 1
+    assert 500 < int(tmp_path.joinpath("usage").read_text()) < 10_000
+
+
+def test_cache_keeps_shared_objects_when_evicting(tmp_path: Path) -> None:
+    cache = FetchCache(tmp_path, max_size=1500)
+
+    cache.set("/a.bin", {"string": b"a" * 300}, validators=[])
+    cache.set("/c.bin", {"string": b"c" * 1000}, validators=[])
+    for path in tmp_path.rglob("*"):
+        if path.is_file():
+            os.utime(path, (0, 0))
+    # Same data as /a.bin; this write exceeds max_size and evicts old files.
+    cache.set("/b.bin", {"string": b"a" * 300}, validators=[])
+
+    assert cache.get("/c.bin", validators=[]) is None
+    cached = cache.get("/b.bin", validators=[])
+    assert cached is not None
+    assert cached["file_obj"].read() == b"a" * 300
+
+
+def test_cache_skips_oversized_objects(tmp_path: Path) -> None:
+    cache = FetchCache(tmp_path, max_size=3000, max_object_size=1000)
+    cache.set("/small.bin", {"string": b"s" * 100}, validators=[])
+    data = bytes(range(256)) * 8
+
+    fetched = cache.fetch(
+        "/large.bin",
+        lambda: {"file_obj": io.BytesIO(data), "mime_type": "image/png"},
+        validators=[],
+    )
+
+    assert fetched["mime_type"] == "image/png"
+    assert fetched["file_obj"].read(100) == data[:100]
+    assert fetched["file_obj"].read() == data[100:]
+    assert cache.get("/large.bin", validators=[]) is None
+    # Writing the large object did not evict everything else.
+    assert cache.get("/small.bin", validators=[]) is not None
+
+
+def test_cache_reads_are_bounded_by_fetch_limit(tmp_path: Path) -> None:
+    class UnclosedBytesIO(io.BytesIO):
+        def close(self) -> None:
+            pass  # Keep it open, to check how much of it was read.
+
+    cache = FetchCache(tmp_path, max_object_size=1000)
+    file_obj = UnclosedBytesIO(b"x" * 1_000_000)
+    limits = helpers._RenderLimits(
+        lambda url: cache.fetch(url, lambda: {"file_obj": file_obj}, validators=[]),
+        {"max_fetched_bytes": 100},
+    )
+
+    with pytest.raises(FetchLimitError):
+        limits.fetch("/huge.bin")
+
+    # Neither the cache nor the limit read the whole resource.
+    assert file_obj.tell() == 1001
+    assert cache.get("/huge.bin", validators=[]) is None
@@ -1,12 +1,26 @@
 import io
+import multiprocessing
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
 from unittest.mock import patch
 
 import pytest
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
 from django.template.exceptions import TemplateDoesNotExist
+from django.test import override_settings
 
 from django_renderpdf import helpers
+from django_renderpdf.helpers import FetchLimitError
 from django_renderpdf.helpers import InvalidRelativeUrl
+from django_renderpdf.helpers import PageLimitError
+from django_renderpdf.helpers import RenderThrottle
+from django_renderpdf.helpers import RenderThrottledError
+from django_renderpdf.helpers import RenderTimeoutError
 
 
 def test_static_relative_fetched() -> None:
@@ -56,7 +70,7 @@ def test_absolute_path_resolves() -> None:
     mocked_file = {"mime_type": "text/css", "string": "* { font-size: 100px; }"}
 
     with patch(
-        "django_renderpdf.helpers.default_url_fetcher",
+        "weasyprint.default_url_fetcher",
         return_value=mocked_file,
         spec=True,
     ) as default_fetcher:
@@ -102,6 +116,19 @@ def test_render_pdf_with_non_existant() -> None:
         helpers.render_pdf(["idontexist.html"], file_)
 
 
+def test_render_html() -> None:
+    assert helpers.render_html(["idontexist.html", "test_template.html"]) == "Hi!\n"
+
+
+def test_html_to_pdf() -> None:
+    file_ = io.BytesIO()
+    helpers.html_to_pdf(helpers.render_html("test_template.html"), file_)
+
+    data = file_.getvalue()
+    assert data.startswith(b"%PDF-1.7\n")
+    assert len(data) > 2000
+
+
 def test_render_pdf_with_merged_options() -> None:
     global_options = {
         "zoom": 1.0,
@@ -121,7 +148,289 @@ def test_render_pdf_with_merged_options() -> None:
     file_ = io.BytesIO()
     with (
         patch.object(settings, "WEASYPRINT_OPTIONS", global_options),
-        patch("django_renderpdf.helpers.HTML.write_pdf") as mock_write_pdf,
+        patch("weasyprint.HTML.write_pdf") as mock_write_pdf,
     ):
         helpers.render_pdf("test_template.html", file_, options=local_options)
         mock_write_pdf.assert_called_once_with(target=file_, **expected_options)
+
+
+def test_render_pdf_with_profile() -> None:
+    global_options = {"uncompressed_pdf": True, "dpi": 96, "zoom": 1.0}
+    file_ = io.BytesIO()
+    with (
+        patch.object(settings, "WEASYPRINT_OPTIONS", global_options),
+        patch("weasyprint.HTML.write_pdf") as mock_write_pdf,
+    ):
+        helpers.render_pdf(
+            "test_template.html",
+            file_,
+            options={"jpeg_quality": 90},
+            profile="small",
+        )
+        mock_write_pdf.assert_called_once_with(
+            target=file_,
+            **{
+                **global_options,
+                **helpers.RENDER_PROFILES["small"],
+                "jpeg_quality": 90,
+            },
+        )
+
+
+@override_settings(RENDERPDF_PROFILES={"custom": {"pdf_version": "1.4"}})
+def test_render_pdf_with_custom_profile() -> None:
+    file_ = io.BytesIO()
+    helpers.render_pdf("test_template.html", file_, profile="custom")
+
+    assert file_.getvalue().startswith(b"%PDF-1.4\n")
+
+
+def test_render_pdf_with_unknown_profile() -> None:
+    with pytest.raises(ImproperlyConfigured, match="Unknown render profile"):
+        helpers.render_pdf("test_template.html", io.BytesIO(), profile="huge")
+
+
+def test_weasyprint_not_imported_eagerly() -> None:
+    # Importing a URLconf which references a PDFView must not load weasyprint.
+    code = "import sys, testapp.urls; print('weasyprint' in sys.modules)"
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+
+    assert result.stdout == "False\n"
+
+
+def test_render_pdf_max_pages_exceeded() -> None:
+    file_ = io.BytesIO()
+
+    with pytest.raises(PageLimitError):
+        helpers.render_pdf("test_template.html", file_, limits={"max_pages": 0})
+    assert file_.getvalue() == b""
+
+
+def test_render_pdf_timeout_exceeded() -> None:
+    file_ = io.BytesIO()
+
+    with pytest.raises(RenderTimeoutError):
+        helpers.render_pdf(
+            "test_template.html",
+            file_,
+            limits={"subprocess": True, "timeout": 0},
+        )
+    assert file_.getvalue() == b""
+
+
+def test_render_pdf_timeout_kills_subprocess() -> None:
+    file_ = io.BytesIO()
+
+    def slow_fetcher(url: str) -> dict:
+        time.sleep(60)
+        return helpers.django_url_fetcher(url)
+
+    start = time.monotonic()
+    with pytest.raises(RenderTimeoutError):
+        helpers.render_pdf(
+            "test_template_with_staticfile.html",
+            file_,
+            url_fetcher=slow_fetcher,
+            limits={"subprocess": True, "timeout": 0.5},
+        )
+
+    assert time.monotonic() - start < 30
+    assert multiprocessing.active_children() == []
+    assert file_.getvalue() == b""
+
+
+def test_render_pdf_max_fetched_bytes_exceeded() -> None:
+    file_ = io.BytesIO()
+
+    with pytest.raises(FetchLimitError):
+        helpers.render_pdf(
+            "test_template_with_staticfile.html",
+            file_,
+            url_fetcher=lambda url: {"string": b"x" * 11, "mime_type": "text/css"},
+            limits={"max_fetched_bytes": 10},
+        )
+
+
+def test_fetch_limit_counts_all_resources() -> None:
+    limits = helpers._RenderLimits(
+        helpers.django_url_fetcher,
+        {"max_fetched_bytes": 30},
+    )
+
+    limits.fetch("/static/styles.css")
+    with pytest.raises(FetchLimitError):
+        limits.fetch("/static/styles.css")
+    # The error is raised again even if WeasyPrint swallowed the original one.
+    with pytest.raises(FetchLimitError):
+        limits.check()
+
+
+def test_max_memory_requires_subprocess() -> None:
+    with pytest.raises(ImproperlyConfigured, match="max_memory"):
+        helpers.render_pdf(
+            "test_template.html",
+            io.BytesIO(),
+            limits={"max_memory": 2**30},
+        )
+
+
+def test_timeout_requires_subprocess() -> None:
+    with pytest.raises(ImproperlyConfigured, match="timeout"):
+        helpers.render_pdf(
+            "test_template.html",
+            io.BytesIO(),
+            limits={"timeout": 30},
+        )
+
+
+def test_render_pdf_in_subprocess() -> None:
+    file_ = io.BytesIO()
+    helpers.render_pdf(
+        "test_template.html",
+        file_,
+        limits={"subprocess": True, "max_memory": 2**31, "timeout": 60},
+    )
+
+    assert file_.getvalue().startswith(b"%PDF-1.7\n")
+
+
+@pytest.mark.django_db
+def test_render_pdf_in_subprocess_fetches_views(tmp_path: Path) -> None:
+    connection.ensure_connection()
+    file_ = io.BytesIO()
+
+    def url_fetcher(url: str) -> dict:
+        # Runs in the subprocess, so report back via a file.
+        tmp_path.joinpath(url.strip("/")).write_text(str(connection.connection))
+        return helpers.django_url_fetcher(url)
+
+    helpers.render_pdf(
+        "test_template_with_view.html",
+        file_,
+        url_fetcher=url_fetcher,
+        limits={"subprocess": True},
+    )
+
+    assert file_.getvalue().startswith(b"%PDF-1.7\n")
+    # The subprocess did not use the connection inherited from this process...
+    assert tmp_path.joinpath("view.css").read_text() == "None"
+    # ...which is still usable here.
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+
+
+def test_render_pdf_in_subprocess_propagates_errors() -> None:
+    file_ = io.BytesIO()
+
+    with pytest.raises(PageLimitError):
+        helpers.render_pdf(
+            "test_template.html",
+            file_,
+            limits={"subprocess": True, "max_pages": 0},
+        )
+    assert file_.getvalue() == b""
+
+
+def test_throttle_rejects_when_queue_is_full() -> None:
+    throttle = RenderThrottle(max_concurrent=1, max_queued=0, retry_after=7)
+
+    with (
+        throttle.acquire(),
+        pytest.raises(RenderThrottledError) as exc_info,
+        throttle.acquire(),
+    ):
+        pass
+
+    assert exc_info.value.retry_after == 7
+    assert throttle.stats()["admitted"] == 1
+    assert throttle.stats()["rejected"] == 1
+
+
+def test_throttle_rejects_after_timeout() -> None:
+    throttle = RenderThrottle(max_concurrent=1, max_queued=1, timeout=0.01)
+
+    with (
+        throttle.acquire(),
+        pytest.raises(RenderThrottledError),
+        throttle.acquire(),
+    ):
+        pass
+
+    assert throttle.stats()["queued"] == 0
+    assert throttle.stats()["rejected"] == 1
+
+
+def test_throttle_queues_renders() -> None:
+    throttle = RenderThrottle(max_concurrent=1, max_queued=1, timeout=10)
+    acquired = threading.Event()
+
+    def hold_slot() -> None:
+        with throttle.acquire():
+            acquired.set()
+            time.sleep(0.05)
+
+    thread = threading.Thread(target=hold_slot)
+    thread.start()
+    acquired.wait()
+    with throttle.acquire():
+        stats = throttle.stats()
+    thread.join()
+
+    assert stats["active"] == 1
+    assert stats["admitted"] == 2
+    assert stats["rejected"] == 0
+    assert stats["max_wait_time"] > 0
+    assert throttle.stats()["active"] == 0
+
+
+def test_throttle_admits_waiters_first() -> None:
+    throttle = RenderThrottle(max_concurrent=1, max_queued=1, timeout=10)
+    slot = throttle.acquire()
+    slot.__enter__()
+    admitted = threading.Event()
+
+    def wait_for_slot() -> None:
+        with throttle.acquire():
+            admitted.set()
+
+    thread = threading.Thread(target=wait_for_slot)
+    thread.start()
+    while throttle.stats()["queued"] == 0:
+        time.sleep(0.001)
+
+    # Holding the lock keeps the waiter from running until the new arrival is done.
+    with throttle._condition:
+        slot.__exit__(None, None, None)
+        with pytest.raises(RenderThrottledError), throttle.acquire():
+            pass
+    thread.join()
+
+    assert admitted.is_set()
+    assert throttle.stats()["admitted"] == 2
+    assert throttle.stats()["rejected"] == 1
+
+
+def test_render_throttle_from_settings() -> None:
+    assert helpers.get_render_throttle() is None
+
+    with override_settings(RENDERPDF_THROTTLE={"max_concurrent": 2}):
+        throttle = helpers.get_render_throttle()
+        assert throttle is not None
+        assert throttle.max_concurrent == 2
+        assert helpers.get_render_throttle() is throttle
+
+    assert helpers.get_render_throttle() is None
+
+
+@override_settings(RENDERPDF_THROTTLE={"max_concurrent": 1, "max_queued": 0})
+def test_render_pdf_throttled() -> None:
+    throttle = helpers.get_render_throttle()
+    assert throttle is not None
+
+    with throttle.acquire(), pytest.raises(RenderThrottledError):
+        helpers.render_pdf("test_template.html", io.BytesIO())
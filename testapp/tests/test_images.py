@@ -0,0 +1,242 @@
+import io
+from pathlib import Path
+from unittest.mock import patch
+
+from django.test import override_settings
+from PIL import Image
+
+from django_renderpdf import helpers
+from django_renderpdf import images
+
+
+def make_image(size: tuple[int, int], format_: str = "JPEG") -> bytes:
+    buffer = io.BytesIO()
+    image = Image.effect_mandelbrot(size, (-2, -1.5, 1, 1.5), 100).convert("RGB")
+    image.save(buffer, format=format_, quality=95)
+    return buffer.getvalue()
+
+
+def test_image_processing_disabled_by_default() -> None:
+    assert images.get_image_processing() is None
+
+
+@override_settings(
+    RENDERPDF_IMAGE_PROCESSING={"max_width": 96, "max_height": 192},
+    WEASYPRINT_OPTIONS={"dpi": 150, "jpeg_quality": 70},
+)
+def test_image_processing_uses_weasyprint_options() -> None:
+    assert images.get_image_processing() == {
+        "max_width": 150,
+        "max_height": 300,
+        "jpeg_quality": 70,
+        # WeasyPrint re-encodes JPEGs itself with this jpeg_quality.
+        "recompress": False,
+    }
+
+
+def test_process_large_jpeg() -> None:
+    data = make_image((2000, 1000))
+
+    result = images.process_image(
+        {"string": data, "mime_type": "image/jpeg", "filename": "a.jpg"},
+        max_width=500,
+        max_height=500,
+        jpeg_quality=80,
+    )
+
+    assert result["mime_type"] == "image/jpeg"
+    assert result["filename"] == "a.jpg"
+    assert len(result["string"]) < len(data)
+    assert Image.open(io.BytesIO(result["string"])).size == (500, 250)
+
+
+def test_process_large_png() -> None:
+    data = make_image((1000, 1000), "PNG")
+
+    result = images.process_image(
+        {"string": data, "mime_type": "image/png"},
+        max_width=100,
+        max_height=100,
+        jpeg_quality=80,
+    )
+
+    assert result["mime_type"] == "image/png"
+    assert Image.open(io.BytesIO(result["string"])).size == (100, 100)
+
+
+def test_process_small_image_kept() -> None:
+    data = make_image((10, 10), "PNG")
+
+    result = images.process_image(
+        {"string": data, "mime_type": "image/png"},
+        max_width=100,
+        max_height=100,
+        jpeg_quality=80,
+    )
+
+    assert result == {"string": data, "mime_type": "image/png"}
+
+
+def test_process_broken_image_kept() -> None:
+    result = images.process_image(
+        {"string": b"not an image", "mime_type": "image/png"},
+        max_width=100,
+        max_height=100,
+        jpeg_quality=80,
+    )
+
+    assert result == {"string": b"not an image", "mime_type": "image/png"}
+
+
+@override_settings(RENDERPDF_IMAGE_PROCESSING={"max_width": 96, "max_height": 96})
+def test_fetcher_processes_images() -> None:
+    data = make_image((1000, 1000))
+
+    with patch(
+        "django_renderpdf.helpers._fetch",
+        return_value={"string": data, "mime_type": "image/jpeg"},
+        spec=True,
+    ):
+        fetched = helpers.django_url_fetcher("https://example.com/photo.jpg")
+
+    # The test settings use 96 dpi, so CSS pixels and image pixels match.
+    assert Image.open(io.BytesIO(fetched["string"])).size == (96, 96)
+
+
+@override_settings(RENDERPDF_IMAGE_PROCESSING={"max_width": 96, "max_height": 96})
+def test_fetcher_ignores_other_resources() -> None:
+    fetched = helpers.django_url_fetcher("/static/styles.css")
+
+    assert fetched == {
+        "string": b"html { margin: 0; }\n",
+        "mime_type": "text/css",
+    }
+
+
+def test_processed_images_are_cached(tmp_path: Path) -> None:
+    data = make_image((1000, 1000))
+
+    with override_settings(RENDERPDF_FETCH_CACHE={"directory": tmp_path}):
+        first = images.process_image({"string": data}, 100, 100, 80)
+        with patch(
+            "django_renderpdf.images._resize",
+            return_value={"string": b"resized"},
+            spec=True,
+        ) as resize:
+            second = images.process_image({"string": data}, 100, 100, 80)
+            images.process_image({"string": data}, 200, 200, 80)
+
+    assert resize.call_count == 1
+    assert second["file_obj"].read() == first["string"]
+
+
+def test_process_large_webp_downscaled() -> None:
+    data = make_image((2000, 2000), "WEBP")
+
+    result = images.process_image(
+        {"string": data, "mime_type": "image/webp"},
+        max_width=1800,
+        max_height=1800,
+        jpeg_quality=80,
+    )
+
+    # The PNG is larger than the lossy WebP, but has fewer pixels to decode.
+    assert result["mime_type"] == "image/png"
+    assert len(result["string"]) > len(data)
+    assert Image.open(io.BytesIO(result["string"])).size == (1800, 1800)
+
+
+def test_process_small_jpeg_recompressed() -> None:
+    data = make_image((100, 100))
+
+    result = images.process_image(
+        {"string": data, "mime_type": "image/jpeg"},
+        max_width=500,
+        max_height=500,
+        jpeg_quality=50,
+    )
+
+    assert len(result["string"]) < len(data)
+    assert Image.open(io.BytesIO(result["string"])).size == (100, 100)
+
+
+@override_settings(RENDERPDF_IMAGE_PROCESSING={"max_width": 96, "max_height": 96})
+def test_image_processing_uses_render_options() -> None:
+    assert images.get_image_processing({"dpi": 192, "jpeg_quality": 60}) == {
+        "max_width": 192,
+        "max_height": 192,
+        "jpeg_quality": 60,
+        "recompress": False,
+    }
+    assert images.get_image_processing({"dpi": None}) is None
+    assert images.get_image_processing({"dpi": None, "jpeg_quality": None}) is None
+
+
+@override_settings(
+    RENDERPDF_IMAGE_PROCESSING={"max_width": 96, "max_height": 96},
+    WEASYPRINT_OPTIONS={"dpi": 96},
+)
+def test_image_processing_recompresses_unless_weasyprint_does() -> None:
+    assert images.get_image_processing() == {
+        "max_width": 96,
+        "max_height": 96,
+        "jpeg_quality": 85,
+        "recompress": True,
+    }
+    assert images.get_image_processing({"dpi": None}) == {
+        "max_width": None,
+        "max_height": None,
+        "jpeg_quality": 85,
+        "recompress": True,
+    }
+    processing = images.get_image_processing({"optimize_images": True})
+    assert processing is not None
+    assert processing["recompress"] is False
+
+
+@override_settings(RENDERPDF_IMAGE_PROCESSING={"max_width": 96, "max_height": 96})
+def test_fetcher_does_not_encode_jpegs_twice() -> None:
+    data = make_image((50, 50))
+
+    with patch(
+        "django_renderpdf.helpers._fetch",
+        return_value={"string": data, "mime_type": "image/jpeg"},
+        spec=True,
+    ):
+        fetched = helpers.django_url_fetcher("https://example.com/photo.jpg")
+
+    # The test settings set a jpeg_quality, so WeasyPrint re-encodes JPEGs itself.
+    assert fetched == {"string": data, "mime_type": "image/jpeg"}
+
+
+def test_process_jpeg_without_quality_kept() -> None:
+    data = make_image((1000, 1000))
+
+    result = images.process_image(
+        {"string": data, "mime_type": "image/jpeg"},
+        max_width=100,
+        max_height=100,
+        jpeg_quality=None,
+    )
+
+    assert result == {"string": data, "mime_type": "image/jpeg"}
+
+
+@override_settings(RENDERPDF_IMAGE_PROCESSING={"max_width": 96, "max_height": 96})
+def test_fetcher_uses_render_profile() -> None:
+    data = make_image((1000, 1000))
+
+    with patch(
+        "django_renderpdf.helpers._fetch",
+        side_effect=lambda url: {"string": data, "mime_type": "image/jpeg"},
+        spec=True,
+    ):
+        with helpers.start_render(profile="archival"):
+            archival = helpers.django_url_fetcher("https://example.com/photo.jpg")
+        with helpers.start_render(profile="small"):
+            small = helpers.django_url_fetcher("https://example.com/photo.jpg")
+
+    # The archival profile disables lossy recompression and downsampling.
+    assert archival == {"string": data, "mime_type": "image/jpeg"}
+    # The small profile downsamples to 150 dpi.
+    assert Image.open(io.BytesIO(small["string"])).size == (150, 150)
@@ -4,9 +4,14 @@ from unittest.mock import patch
 import pytest
 from django.core.exceptions import ImproperlyConfigured
 from django.http import HttpResponse
+from django.template.loader import select_template
 from django.test import RequestFactory
 from django.test import TestCase
+from django.test import override_settings
 
+from django_renderpdf import helpers
+from django_renderpdf.helpers import PageLimitError
+from django_renderpdf.helpers import RenderTimeoutError
 from django_renderpdf.views import PDFView
 from testapp import views
 
@@ -98,6 +103,34 @@ class ForceHTMLTestCase(TestCase):
         # Assert that response looks like a PDF
         assert response.content.startswith(b"%PDF-1.") is True
 
+    def test_force_html_large_document(self) -> None:
+        request = factory.get("/some_view?html=true")
+        html = "x" * 1_000_000
+
+        with patch("django_renderpdf.helpers.render_html", return_value=html):
+            response = views.AllowForceHtmlView.as_view()(request)
+
+        assert isinstance(response, HttpResponse)
+        assert response.status_code == 200
+        assert response.content == html.encode()
+
+
+class RenderOnceTestCase(TestCase):
+    def test_template_rendered_once(self) -> None:
+        request = factory.get("/some_view")
+
+        with (
+            patch(
+                "django_renderpdf.helpers.select_template",
+                wraps=select_template,
+            ) as select,
+            patch("django_renderpdf.helpers._html_to_pdf", spec=True) as html_to_pdf,
+        ):
+            views.NoPromptDownloadView.as_view()(request)
+
+        assert select.call_count == 1
+        assert html_to_pdf.call_args.args[0] == "Hi!\n"
+
 
 class CustomUrlFetcherTestCase(TestCase):
     pass  # TODO
@@ -122,6 +155,93 @@ class StaticFileResolutionTestCase(TestCase):
         assert fetcher.call_args == call("/static/path/not/relevant.css")
 
 
+class RenderLimitsTestCase(TestCase):
+    def test_limit_exceeded_returns_error_response(self) -> None:
+        request = factory.get("/some_view")
+
+        with patch(
+            "django_renderpdf.helpers._html_to_pdf",
+            side_effect=PageLimitError("Document has 9 pages, the limit is 5."),
+            spec=True,
+        ):
+            response = views.PromptDownloadView.as_view()(request)
+
+        assert isinstance(response, HttpResponse)
+        assert response.status_code == 422
+        assert b"limit is 5" not in response.content
+        assert b"Content-Disposition:" not in response.serialize_headers()
+        assert not response.has_header("Retry-After")
+
+    def test_timeout_returns_service_unavailable(self) -> None:
+        request = factory.get("/some_view")
+
+        with patch(
+            "django_renderpdf.helpers._html_to_pdf",
+            side_effect=RenderTimeoutError("Rendering took longer than 30 seconds."),
+            spec=True,
+        ):
+            response = views.NoPromptDownloadView.as_view()(request)
+
+        assert isinstance(response, HttpResponse)
+        assert response.status_code == 503
+        assert response.content == b"Rendering the PDF took too long."
+        assert not response.has_header("Retry-After")
+
+    @override_settings(
+        RENDERPDF_THROTTLE={"max_concurrent": 1, "max_queued": 0, "retry_after": 3},
+    )
+    def test_throttled_returns_retry_after(self) -> None:
+        request = factory.get("/some_view")
+        throttle = helpers.get_render_throttle()
+        assert throttle is not None
+
+        with (
+            throttle.acquire(),
+            patch(
+                "django_renderpdf.helpers.select_template",
+                wraps=select_template,
+            ) as select,
+        ):
+            response = views.NoPromptDownloadView.as_view()(request)
+
+        assert isinstance(response, HttpResponse)
+        assert response.status_code == 503
+        assert response["Retry-After"] == "3"
+        assert b"Too many PDFs" in response.content
+        # Throttled requests don't render their template at all.
+        assert select.call_count == 0
+
+    @override_settings(RENDERPDF_THROTTLE={"max_concurrent": 1, "max_queued": 0})
+    def test_force_html_not_throttled(self) -> None:
+        request = factory.get("/some_view?html=true")
+        throttle = helpers.get_render_throttle()
+        assert throttle is not None
+
+        with throttle.acquire():
+            response = views.NoPromptDownloadView.as_view()(request)
+
+        assert response.status_code == 200
+
+    def test_view_limits_are_passed(self) -> None:
+        request = factory.get("/some_view")
+
+        with patch("django_renderpdf.helpers._html_to_pdf", spec=True) as html_to_pdf:
+            views.LimitedView.as_view()(request)
+
+        assert html_to_pdf.call_args.args[4].max_pages == 1
+
+
+class RenderProfileTestCase(TestCase):
+    def test_view_profile_is_passed(self) -> None:
+        request = factory.get("/some_view")
+
+        with patch("django_renderpdf.helpers._html_to_pdf", spec=True) as html_to_pdf:
+            views.SmallView.as_view()(request)
+
+        options = html_to_pdf.call_args.args[3]
+        assert options["dpi"] == helpers.RENDER_PROFILES["small"]["dpi"]
+
+
 def test_view_with_no_template(rf: RequestFactory) -> None:
     request = factory.get("/test")
 
@@ -26,6 +26,16 @@ class DisallowForceHtmlView(PDFView):
     allow_force_html = False
 
 
+class LimitedView(PDFView):
+    template_name = "test_template.html"
+    limits = {"max_pages": 1}  # noqa: RUF012
+
+
+class SmallView(PDFView):
+    template_name = "test_template.html"
+    profile = "small"
+
+
 class TemplateWithStaticFileView(PDFView):
     template_name = "test_template_with_staticfile.html"
 